@@ -2,13 +2,40 @@
 Tic Tac Toe Player
 """
 
-import copy
+import functools
 import math
 
 X = "X"
 O = "O"
 EMPTY = None
 
+# The eight winning lines of cells: three rows, three columns and two diagonals
+LINES = (
+    ((0, 0), (0, 1), (0, 2)),
+    ((1, 0), (1, 1), (1, 2)),
+    ((2, 0), (2, 1), (2, 2)),
+    ((0, 0), (1, 0), (2, 0)),
+    ((0, 1), (1, 1), (2, 1)),
+    ((0, 2), (1, 2), (2, 2)),
+    ((0, 0), (1, 1), (2, 2)),
+    ((0, 2), (1, 1), (2, 0)),
+)
+
+# The search runs on bitboards: one 9-bit integer per player, where cell (i, j)
+# is bit 3 * i + j. These masks are the winning lines.
+WIN_MASKS = tuple(sum(1 << (3 * i + j) for i, j in line) for line in LINES)
+FULL_BOARD = 0b111111111
+
+# Moves are tried center first, then corners, then edges, which tends to reach
+# the best move early so the search can stop as soon as a win is found.
+MOVE_ORDER = ((1, 1), (0, 0), (0, 2), (2, 0), (2, 2), (0, 1), (1, 0), (1, 2), (2, 1))
+MOVE_BITS = tuple(1 << (3 * i + j) for i, j in MOVE_ORDER)
+# For each mask of taken cells, the empty cells' bits in MOVE_ORDER
+EMPTY_BITS = tuple(
+    tuple(bit for bit in MOVE_BITS if not taken & bit)
+    for taken in range(FULL_BOARD + 1)
+)
+
 
 def initial_state():
     """
@@ -32,26 +59,22 @@ def player(board):
 
 def actions(board):
     """
-    Returns set of all possible actions (i, j) available on the board.
+    Returns list of all possible actions (i, j) available on the board,
+    in the order they are worth searching.
     """
-    # initialize actions set
-    actions = set()
-    for i in range(3):
-        for j in range(3):
-            if board[i][j] == EMPTY:
-                actions.add((i, j))
-    return actions
+    return [(i, j) for i, j in MOVE_ORDER if board[i][j] == EMPTY]
 
 
 def result(board, action):
     """
     Returns the board that results from making move (i, j) on the board.
     """
-    valid_actions = actions(board)
     (i, j) = action
-    if (i, j) not in valid_actions:
+    # check the target cell directly rather than building every action
+    if not (0 <= i < 3 and 0 <= j < 3) or board[i][j] != EMPTY:
         raise ValueError
-    new_board = copy.deepcopy(board)  # clone the board so board is left intact
+    # clone the board so board is left intact; cells are immutable
+    new_board = [row[:] for row in board]
     new_board[i][j] = player(board)
     return new_board
 
@@ -60,22 +83,10 @@ def winner(board):
     """
     Returns the winner of the game, if there is one.
     """
-    # Check rows
-    for row in board:
-        if row[0] == row[1] == row[2] and row[0] != EMPTY:
-            return row[0]
-
-    # Check columns
-    for j in range(3):
-        if board[0][j] == board[1][j] == board[2][j] and board[0][j] != EMPTY:
-            return board[0][j]
-
-    # Check diagonals
-    if board[0][0] == board[1][1] == board[2][2] and board[0][0] != EMPTY:
-        return board[0][0]
-    if board[0][2] == board[1][1] == board[2][0] and board[0][2] != EMPTY:
-        return board[0][2]
-
+    for a, b, c in LINES:
+        va = board[a[0]][a[1]]
+        if va != EMPTY and va == board[b[0]][b[1]] == board[c[0]][c[1]]:
+            return va
     return None
 
 
@@ -109,58 +120,100 @@ def utility(board):
     return 0
 
 
-def max_value(board, alpha=-math.inf, beta=math.inf):
-    if terminal(board):
-        return utility(board)
+def to_bits(board):
+    """
+    Returns the (x, o) bitboards for a board.
+    """
+    x = o = 0
+    bit = 1  # walks the cells in row-major order, i.e. bit 3 * i + j
+    for row in board:
+        for cell in row:
+            if cell == X:
+                x |= bit
+            elif cell == O:
+                o |= bit
+            bit <<= 1
+    return x, o
+
+
+@functools.lru_cache(maxsize=None)  # only 512 possible bitboards
+def has_win(bits):
+    """
+    Returns True if the bitboard contains a winning line.
+    """
+    return any(bits & mask == mask for mask in WIN_MASKS)
+
+
+def bits_winner(x, o):
+    if has_win(x):
+        return X
+    if has_win(o):
+        return O
+    return None
+
+
+def bits_terminal(x, o):
+    return has_win(x) or has_win(o) or x | o == FULL_BOARD
+
+
+def bits_utility(x, o):
+    win = bits_winner(x, o)
+    if win == X:
+        return 1
+    if win == O:
+        return -1
+    return 0
+
+
+# The position alone decides whose turn it is, so exact values are memoized per
+# (x, o) and stay valid across minimax calls. Tic-tac-toe has only 5478
+# reachable positions, so the caches stay small.
+@functools.lru_cache(maxsize=None)
+def max_value(x, o):
+    if bits_terminal(x, o):
+        return bits_utility(x, o)
     v = -math.inf
-    for action in actions(board):
-        v = max(v, min_value(result(board, action), alpha, beta))
-        if v >= beta:
-            return v
-        alpha = max(alpha, v)
+    for bit in EMPTY_BITS[x | o]:
+        v = max(v, min_value(x | bit, o))
+        if v == 1:  # nothing beats a win
+            break
     return v
 
 
-def min_value(board, alpha=-math.inf, beta=math.inf):
-    if terminal(board):
-        return utility(board)
+@functools.lru_cache(maxsize=None)
+def min_value(x, o):
+    if bits_terminal(x, o):
+        return bits_utility(x, o)
     v = math.inf
-    for action in actions(board):
-        v = min(v, max_value(result(board, action), alpha, beta))
-        if v <= alpha:
-            return v
-        beta = min(beta, v)
+    for bit in EMPTY_BITS[x | o]:
+        v = min(v, max_value(x, o | bit))
+        if v == -1:  # nothing beats a win
+            break
     return v
 
 
 def minimax(board):
     """
-    Returns the optimal action for the current player on the board using alpha-beta pruning.
+    Returns the optimal action for the current player on the board.
     """
     if terminal(board):
         return None
     current_player = player(board)
-    valid_actions = actions(board)
+    x, o = to_bits(board)
     optimal_action = None
 
     if current_player == X:
         v = -math.inf
-        alpha = -math.inf
-        beta = math.inf
-        for action in valid_actions:
-            temp_v = min_value(result(board, action), alpha, beta)
+        for i, j in actions(board):
+            temp_v = min_value(x | 1 << (3 * i + j), o)
             if temp_v > v:
                 v = temp_v
-                optimal_action = action
-            alpha = max(alpha, v)
+                optimal_action = (i, j)
     else:
         v = math.inf
-        alpha = -math.inf
-        beta = math.inf
-        for action in valid_actions:
-            temp_v = max_value(result(board, action), alpha, beta)
+        for i, j in actions(board):
+            temp_v = max_value(x, o | 1 << (3 * i + j))
             if temp_v < v:
                 v = temp_v
-                optimal_action = action
-            beta = min(beta, v)
+                optimal_action = (i, j)
     return optimal_action
@@ -1,5 +1,24 @@
 import itertools
 import random
+from collections import deque
+
+
+def neighbor_map(height, width):
+    """
+    Returns a dict mapping each cell of a height x width board
+    to a tuple of the cells within one row and column of it,
+    not including the cell itself.
+    """
+    return {
+        (i, j): tuple(
+            (ni, nj)
+            for ni in (i - 1, i, i + 1)
+            for nj in (j - 1, j, j + 1)
+            if (ni, nj) != (i, j) and 0 <= ni < height and 0 <= nj < width
+        )
+        for i in range(height)
+        for j in range(width)
+    }
 
 
 class Minesweeper:
@@ -33,6 +52,9 @@ class Minesweeper:
         # At first, player has found no mines
         self.mines_found = set()
 
+        # Cells within one row and column of each cell
+        self.neighbors = neighbor_map(self.height, self.width)
+
     def print(self):
         """
         Prints a text-based representation
@@ -59,23 +81,7 @@ class Minesweeper:
         not including the cell itself.
         """
 
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
-
-        return count
+        return sum(1 for i, j in self.neighbors[cell] if self.board[i][j])
 
     def won(self):
         """
@@ -91,31 +97,49 @@ class Sentence:
     and a count of the number of those cells which are mines.
     """
 
+    __slots__ = ("cells", "count", "status")
+
     def __init__(self, cells, count):
-        self.cells = set(cells)
+        self.cells = frozenset(cells)
         self.count = count
+        self.update_status()
 
     def __eq__(self, other):
         return self.cells == other.cells and self.count == other.count
 
+    def __hash__(self):
+        return hash((self.cells, self.count))
+
     def __str__(self):
         return f"{self.cells} = {self.count}"
 
+    def update_status(self):
+        """
+        Caches whether every cell in self.cells is known to be
+        a mine ("MINE"), known to be safe ("SAFE"), or neither (None).
+        """
+        if len(self.cells) == self.count and self.count != 0:
+            self.status = "MINE"
+        elif self.count == 0 and self.cells:
+            self.status = "SAFE"
+        else:
+            self.status = None
+
     def known_mines(self):
         """
         Returns the set of all cells in self.cells known to be mines.
         """
-        if len(self.cells) == self.count and self.count != 0:
+        if self.status == "MINE":
             return self.cells
-        return set()  # return empty cells if unknown
+        return frozenset()  # return empty cells if unknown
 
     def known_safes(self):
         """
         Returns the set of all cells in self.cells known to be safe.
         """
-        if self.count == 0:
+        if self.status == "SAFE":
             return self.cells
-        return set()
+        return frozenset()
 
     def mark_mine(self, cell):
         """
@@ -123,8 +147,9 @@ class Sentence:
         a cell is known to be a mine.
         """
         if cell in self.cells:
-            self.cells.remove(cell)
+            self.cells = self.cells - {cell}
             self.count -= 1  # decrement count - mine is removed
+            self.update_status()
 
     def mark_safe(self, cell):
         """
@@ -132,7 +157,32 @@ class Sentence:
         a cell is known to be safe.
         """
         if cell in self.cells:
-            self.cells.remove(cell)
+            self.cells = self.cells - {cell}
+            self.update_status()
+
+    def mark_mines(self, cells):
+        """
+        Same as mark_mine, for a whole set of cells at once.
+        Returns True if the sentence changed.
+        """
+        mines = self.cells & cells
+        if not mines:
+            return False
+        self.cells = self.cells - mines
+        self.count -= len(mines)
+        self.update_status()
+        return True
+
+    def mark_safes(self, cells):
+        """
+        Same as mark_safe, for a whole set of cells at once.
+        Returns True if the sentence changed.
+        """
+        if self.cells.isdisjoint(cells):
+            return False
+        self.cells = self.cells - cells
+        self.update_status()
+        return True
 
 
 class MinesweeperAI:
@@ -155,24 +205,49 @@ class MinesweeperAI:
 
         # List of sentences about the game known to be true
         self.knowledge = []
+        # The same sentences as a set, for constant time lookups
+        self.knowledge_set = set()
+        # Sentences that are new or changed since subset inference last ran
+        self.pending = deque()
+
+        # Cells within one row and column of each cell
+        self.neighbors = neighbor_map(self.height, self.width)
 
     def mark_mine(self, cell):
         """
         Marks a cell as a mine, and updates all knowledge
         to mark that cell as a mine as well.
         """
-        self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        self.mark_mines_bulk({cell})
 
     def mark_safe(self, cell):
         """
         Marks a cell as safe, and updates all knowledge
         to mark that cell as safe as well.
         """
-        self.safes.add(cell)
+        self.mark_safes_bulk({cell})
+
+    def mark_mines_bulk(self, cells):
+        """
+        Marks every cell in a set as a mine, updating
+        each sentence in the knowledge base only once.
+        """
+        self.mines |= cells
         for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+            if sentence.mark_mines(cells):
+                self.pending.append(sentence)
+        self.knowledge_set = set(self.knowledge)  # hashes may have changed
+
+    def mark_safes_bulk(self, cells):
+        """
+        Marks every cell in a set as safe, updating
+        each sentence in the knowledge base only once.
+        """
+        self.safes |= cells
+        for sentence in self.knowledge:
+            if sentence.mark_safes(cells):
+                self.pending.append(sentence)
+        self.knowledge_set = set(self.knowledge)  # hashes may have changed
 
     def add_knowledge(self, cell, count):
         """
@@ -197,62 +272,58 @@ class MinesweeperAI:
         # 3. Add a new sentence to the AI's knowledge base
         neighbours = set()
         number_known_mines = 0
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    neighbour = (i, j)
-                    if neighbour in self.mines:
-                        number_known_mines += 1  # neighbour is a known mine
-                    elif neighbour not in self.safes:
-                        neighbours.add(
-                            neighbour
-                        )  # only neighbours that are not known are added
+        for neighbour in self.neighbors[cell]:
+            if neighbour in self.mines:
+                number_known_mines += 1  # neighbour is a known mine
+            elif neighbour not in self.safes:
+                neighbours.add(
+                    neighbour
+                )  # only neighbours that are not known are added
         adjusted_count = count - number_known_mines
         if neighbours:
             if adjusted_count == 0:
-                for neighbour in neighbours:
-                    self.mark_safe(neighbour)
+                self.mark_safes_bulk(neighbours)
             elif adjusted_count == len(neighbours):
-                for neighbour in neighbours:
-                    self.mark_mine(neighbour)
+                self.mark_mines_bulk(neighbours)
             else:
                 new_sentence = Sentence(neighbours, adjusted_count)  # The new sentence
                 if (
-                    new_sentence not in self.knowledge and new_sentence.cells
+                    new_sentence not in self.knowledge_set and new_sentence.cells
                 ):  # Only add if not redundant
                     self.knowledge.append(new_sentence)
+                    self.knowledge_set.add(new_sentence)
+                    self.pending.append(new_sentence)
 
         # 4. Mark new safes/mines
         self.infer()
 
         # 5. Infer new sentences from existing ones
-        while True:
+        # Pairs of unchanged sentences were already combined on earlier moves,
+        # so only new or changed sentences need to be paired with the rest
+        while self.pending:
+            s1 = self.pending.popleft()
+            if not s1.cells:
+                continue
             new_sentences = []
-            for s1 in self.knowledge:
-                for s2 in self.knowledge:
-                    if s1 == s2 or not s1.cells or not s2.cells:
-                        continue
-                    if s1.cells < s2.cells:
-                        diff_cells = s2.cells - s1.cells
-                        diff_count = s2.count - s1.count
-                        if diff_cells:
-                            new_sentence = Sentence(diff_cells, diff_count)
-                            if (
-                                new_sentence not in self.knowledge
-                                and new_sentence not in new_sentences
-                            ):
-                                new_sentences.append(new_sentence)
-            if not new_sentences:
-                break
+            for s2 in self.knowledge:
+                # Strict subset tests fail fast on the sizes
+                if s1.cells < s2.cells:
+                    new_sentence = Sentence(s2.cells - s1.cells, s2.count - s1.count)
+                elif s2.cells < s1.cells and s2.cells:
+                    new_sentence = Sentence(s1.cells - s2.cells, s1.count - s2.count)
+                else:
+                    continue
+                if new_sentence not in self.knowledge_set:
+                    self.knowledge_set.add(new_sentence)
+                    new_sentences.append(new_sentence)
             self.knowledge.extend(new_sentences)
-            self.infer()
+            self.pending.extend(new_sentences)
+            # Only a sentence that settles its cells can lead to new safes/mines
+            if any(s.status for s in new_sentences):
+                self.infer()
         # Remove empty sentences
         self.knowledge = [s for s in self.knowledge if s.cells]
+        self.knowledge_set = set(self.knowledge)
 
     def infer(self):
         """
@@ -260,22 +331,20 @@ class MinesweeperAI:
         repeatedly mark new safe cells and mine cells
         """
         while True:
-            inference_made = False
+            # Collect everything this pass concludes, then mark it in one go
+            new_mines = set()
+            new_safes = set()
             for sentence in self.knowledge:
-                if not sentence.cells:
-                    continue
-                sentence_mines = list(sentence.known_mines())
-                sentence_safes = list(sentence.known_safes())
-                for mine in sentence_mines:
-                    if mine not in self.mines:
-                        self.mark_mine(mine)
-                        inference_made = True
-                for safe in sentence_safes:
-                    if safe not in self.safes:
-                        self.mark_safe(safe)
-                        inference_made = True
-            if not inference_made:
+                if sentence.status == "MINE":
+                    new_mines |= sentence.cells
+                elif sentence.status == "SAFE":
+                    new_safes |= sentence.cells
+            if not new_mines and not new_safes:
                 break
+            if new_mines:
+                self.mark_mines_bulk(new_mines)
+            if new_safes:
+                self.mark_safes_bulk(new_safes)
 
     def make_safe_move(self):
         """
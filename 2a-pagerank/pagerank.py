@@ -1,10 +1,14 @@
+import bisect
 import os
 import random
 import re
 import sys
 
+import numpy as np
+
 DAMPING = 0.85
 SAMPLES = 10000
+LINK_RE = re.compile(r"<a\s+[^>]*?href=\"([^\"]*)\"")
 
 
 def main():
@@ -35,7 +39,7 @@ def crawl(directory):
             continue
         with open(os.path.join(directory, filename)) as f:
             contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
+            links = LINK_RE.findall(contents)
             pages[filename] = set(links) - {filename}
 
     # Only include links to other pages in the corpus
@@ -77,20 +81,22 @@ def sample_pagerank(corpus, damping_factor, n):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    visit_counts = {page: 0 for page in corpus}
-    first_page = random.choice(list(corpus.keys()))
-    visit_counts[first_page] += 1
-    current_page = first_page
+    N = len(corpus)
+    pages = sorted(corpus)
+    # Column i of the transition matrix is transition_model(corpus, pages[i], ...);
+    # store row i of the result as the cumulative distribution out of page i
+    transitions = (1 - damping_factor) / N + damping_factor * link_matrix(corpus, pages)
+    cum_weights = np.cumsum(transitions, axis=0).T.tolist()
+    visit_counts = [0] * N
+    current_page = random.randrange(N)
+    visit_counts[current_page] += 1
     for i in range(2, n + 1):  # from 2 to n
-        page_distribution = transition_model(corpus, current_page, damping_factor)
-        next_page = random.choices(
-            population=list(page_distribution.keys()),
-            weights=list(page_distribution.values()),
-            k=1,
-        )[0]
-        visit_counts[next_page] += 1
-        current_page = next_page
-    pagerank = {page: count / n for page, count in visit_counts.items()}
+        # hi=N - 1 guards against the last cumulative weight rounding below 1
+        current_page = bisect.bisect(
+            cum_weights[current_page], random.random(), 0, N - 1
+        )
+        visit_counts[current_page] += 1
+    pagerank = {page: count / n for page, count in zip(pages, visit_counts)}
     return pagerank
 
 
@@ -104,32 +110,52 @@ def iterate_pagerank(corpus, damping_factor):
     PageRank values should sum to 1.
     """
     N = len(corpus)
-    pageranks = {page: 1 / N for page in corpus}
+    pages = sorted(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    # One entry per link, from page `sources[k]` to page `targets[k]`
+    sources = np.array(
+        [index[page] for page in pages for link in corpus[page]], dtype=np.intp
+    )
+    targets = np.array(
+        [index[link] for page in pages for link in corpus[page]], dtype=np.intp
+    )
+    out_degree = np.array([max(len(corpus[page]), 1) for page in pages])
+    dangling = np.array([not corpus[page] for page in pages])
+    pageranks = np.full(N, 1 / N)
     THRESHOLD = 0.001
     while True:
-        new_pageranks = {}
-
-        for page in corpus:  # for each page in corpus
-            sum = 0
-            for i in corpus:  # check every other page
-                if corpus[i]:  # if the other page has links
-                    if (
-                        page in corpus[i]
-                    ):  # if this page is linked in the links of other page
-                        sum += pageranks[i] / len(corpus[i])
-                else:  # if the other page has no links
-                    sum += pageranks[i] / N
-            new_pageranks[page] = (1 - damping_factor) / N + damping_factor * sum
+        # Rank flowing along links, plus dangling pages' rank spread evenly
+        share = pageranks / out_degree
+        linked = np.bincount(targets, weights=share[sources], minlength=N)
+        new_pageranks = (1 - damping_factor) / N + damping_factor * (
+            linked + pageranks[dangling].sum() / N
+        )
 
         # check stop criterion
-        stop = all(
-            abs(new_pageranks[page] - pageranks[page]) < THRESHOLD for page in pageranks
-        )
+        stop = np.max(np.abs(new_pageranks - pageranks)) < THRESHOLD
         pageranks = new_pageranks
         if stop:
             break
 
-    return pageranks
+    return {page: float(rank) for page, rank in zip(pages, pageranks)}
+
+
+def link_matrix(corpus, pages):
+    """
+    Return an N x N matrix `M` for the pages in `pages` where
+    M[j, i] is the probability of following a link from page i to page j.
+    A page with no links is treated as linking to every page.
+    """
+    N = len(pages)
+    index = {page: i for i, page in enumerate(pages)}
+    M = np.zeros((N, N))
+    for i, page in enumerate(pages):
+        links = corpus[page]
+        if links:
+            M[[index[link] for link in links], i] = 1 / len(links)
+        else:
+            M[:, i] = 1 / N
+    return M
 
 
 if __name__ == "__main__":
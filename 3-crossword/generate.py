@@ -1,7 +1,24 @@
+import heapq
 import sys
+from collections import deque
+
+import numpy as np
 
 from crossword import *
 
+# Maximum number of orderings kept by `order_domain_values`
+ORDER_CACHE_SIZE = 10000
+# Number of entries past which the MRV heap is rebuilt to drop stale ones
+MRV_HEAP_SIZE = 10000
+
+
+def bits_of(flags):
+    """
+    Return the bitmask with bit k set for each true entry k of the
+    boolean array `flags`.
+    """
+    return int.from_bytes(np.packbits(flags, bitorder="little").tobytes(), "little")
+
 
 class CrosswordCreator():
 
@@ -10,25 +27,111 @@ class CrosswordCreator():
         Create new CSP crossword generate.
         """
         self.crossword = crossword
+        # Start each domain from just the words of the variable's length,
+        # which makes the domains node consistent from the outset
+        self.words_by_length = dict()
+        for word in self.crossword.words:
+            self.words_by_length.setdefault(len(word), set()).add(word)
         self.domains = {
-            var: self.crossword.words.copy()
+            var: self.words_by_length.get(var.length, set()).copy()
             for var in self.crossword.variables
         }
+        # Index the overlaps by variable once: self.overlap_of[x][y] is the
+        # (i, j) overlap of x and y, for each neighbor y of x
+        self.overlap_of = {var: dict() for var in self.crossword.variables}
+        for (x, y), overlap in self.crossword.overlaps.items():
+            if overlap is not None:
+                self.overlap_of[x][y] = overlap
+        self.neighbors = {
+            var: set(self.overlap_of[var]) for var in self.crossword.variables
+        }
+        self.degree = {var: len(self.neighbors[var]) for var in self.neighbors}
+        # Number the variables, so that the search can hold an assignment as
+        # a list with the word for self.variables[k], or None, at index k
+        self.variables = list(self.domains)
+        self.var_id = {var: k for k, var in enumerate(self.variables)}
+        # self.overlap_ids[var] lists (neighbor, neighbor id, i, j) for each
+        # neighbor of var and their (i, j) overlap
+        self.overlap_ids = {
+            var: [
+                (neighbor, self.var_id[neighbor], i, j)
+                for neighbor, (i, j) in self.overlap_of[var].items()
+            ]
+            for var in self.variables
+        }
+        # Heap of (domain size, -degree, id, var) entries for choosing the
+        # next variable to assign. A fresh entry is pushed for each variable
+        # in `self.mrv_changed`, whose domain changed since the last choice,
+        # and entries whose size no longer matches are stale
+        self.mrv_heap = []
+        self.mrv_changed = set(self.domains)
+
+        # Number the words of each length, so that a set of words of one
+        # length can be stored as a bitmask with bit `id` set for each word
+        self.word_id = dict()
+        self.word_bit = dict()
+        self.words_of_length = dict()
+        for word in sorted(self.crossword.words):
+            same_length = self.words_of_length.setdefault(len(word), [])
+            self.word_id[word] = len(same_length)
+            self.word_bit[word] = 1 << len(same_length)
+            same_length.append(word)
+
+        # Tables of the letters of the words of each length, built by
+        # `word_codes` as they are needed
+        self.codes_of_length = dict()
+
+        # Bitmask counterparts of `self.domains`, built by `index_domains`
+        # and brought up to date by `sync_domains` after outside changes:
+        # self.domain_mask[var] holds every word in the domain of `var`, and
+        # self.letter_masks[var][k][letter] the words in it with `letter` at
+        # position k (a letter without any such word has no entry)
+        self.domain_mask = dict()
+        self.letter_masks = dict()
+        # The words the bitmasks of each variable stand for, kept apart from
+        # `self.domains` so that outside changes to it can be spotted
+        self.indexed_words = dict()
+        # Positions of each variable whose last word with some letter there
+        # was removed, so arcs depending on that position must be revisited
+        self.lost_support = dict()
+        self.index_domains()
+        # Every batch of words removed by `remove_words` during a search, in
+        # order, so that backtracking can undo the pruning done below a
+        # failed assignment. Each is logged as (var, words, previous domain
+        # mask, previous (k, letter, mask) of each letter mask the batch
+        # changed). Pruning done outside a search is kept, so is not logged
+        self.removed = []
+        self.searching = False
+        # self.conflicts[var] holds the assigned variables whose values led
+        # to words being removed from the domain of var, so that the search
+        # can jump back past assignments that had no part in a failure.
+        # Each change is logged as (var, previous conflicts) to be undone
+        self.conflicts = {var: frozenset() for var in self.variables}
+        self.conflict_log = []
+        # Variable whose domain was emptied by the last failed `ac3`
+        self.wiped_out = None
+        # Orderings computed by `order_domain_values`, keyed by the domains
+        # they were computed from
+        self.order_cache = dict()
+
+        # Font used by `save`, and the size of each letter drawn in it
+        self.font = None
+        self.glyph_sizes = dict()
 
     def letter_grid(self, assignment):
         """
         Return 2D array representing a given assignment.
         """
-        letters = [
-            [None for _ in range(self.crossword.width)]
-            for _ in range(self.crossword.height)
-        ]
+        # Empty cells hold "", so they test false like the None they replace
+        letters = np.full(
+            (self.crossword.height, self.crossword.width), "", dtype="<U1"
+        )
         for variable, word in assignment.items():
-            direction = variable.direction
-            for k in range(len(word)):
-                i = variable.i + (k if direction == Variable.DOWN else 0)
-                j = variable.j + (k if direction == Variable.ACROSS else 0)
-                letters[i][j] = word[k]
+            i, j = variable.i, variable.j
+            if variable.direction == Variable.DOWN:
+                letters[i:i + len(word), j] = list(word)
+            else:
+                letters[i, j:j + len(word)] = list(word)
         return letters
 
     def print(self, assignment):
@@ -36,13 +139,17 @@ class CrosswordCreator():
         Print crossword assignment to the terminal.
         """
         letters = self.letter_grid(assignment)
-        for i in range(self.crossword.height):
-            for j in range(self.crossword.width):
-                if self.crossword.structure[i][j]:
-                    print(letters[i][j] or " ", end="")
-                else:
-                    print("█", end="")
-            print()
+        structure = self.crossword.structure
+        width = self.crossword.width
+        rows = (
+            "".join(
+                (letters[i][j] or " ") if structure[i][j] else "█"
+                for j in range(width)
+            )
+            for i in range(self.crossword.height)
+        )
+        # Write the grid in one go rather than one print call per cell
+        sys.stdout.write("\n".join(rows) + "\n")
 
     def save(self, assignment, filename):
         """
@@ -61,7 +168,11 @@ class CrosswordCreator():
              self.crossword.height * cell_size),
             "black"
         )
-        font = ImageFont.truetype("assets/fonts/OpenSans-Regular.ttf", 80)
+        # The font and glyph sizes are the same for every save, so load the
+        # font once and measure each letter the first time it is drawn
+        if self.font is None:
+            self.font = ImageFont.truetype("assets/fonts/OpenSans-Regular.ttf", 80)
+        font = self.font
         draw = ImageDraw.Draw(img)
 
         for i in range(self.crossword.height):
@@ -76,7 +187,10 @@ class CrosswordCreator():
                 if self.crossword.structure[i][j]:
                     draw.rectangle(rect, fill="white")
                     if letters[i][j]:
-                        _, _, w, h = draw.textbbox((0, 0), letters[i][j], font=font)
+                        if letters[i][j] not in self.glyph_sizes:
+                            _, _, w, h = draw.textbbox((0, 0), letters[i][j], font=font)
+                            self.glyph_sizes[letters[i][j]] = (w, h)
+                        w, h = self.glyph_sizes[letters[i][j]]
                         draw.text(
                             (rect[0][0] + ((interior_size - w) / 2),
                              rect[0][1] + ((interior_size - h) / 2) - 10),
@@ -99,39 +213,238 @@ class CrosswordCreator():
         (Remove any values that are inconsistent with a variable's unary
          constraints; in this case, the length of the word.)
         """
-        for var in self.domains:
-            for word in self.domains[
-                var
-            ].copy():  # copy() to fix "Set changed size during iteration" error
-                if len(word) != var.length:
-                    self.domains[var].remove(word)
+        # `sync_domains` drops the words of the wrong length as it brings
+        # the bitmasks up to date
+        self.sync_domains()
+
+    def index_domains(self, variables=None):
+        """
+        Rebuild `self.domain_mask` and `self.letter_masks` from `self.domains`,
+        for just `variables` if given, or else for every variable.
+        Every word in those domains must already be numbered and of the
+        right length.
+        """
+        if variables is None:
+            self.domain_mask = dict()
+            self.letter_masks = dict()
+            self.indexed_words = dict()
+            variables = self.domains
+        # Variables of the same length often have the same domain, which
+        # then only needs to be indexed once
+        indexed = dict()
+        for var in variables:
+            words = self.domains[var]
+            key = (var.length, self.words_mask(words))
+            if key not in indexed:
+                indexed[key] = self.letter_masks_of(var.length, words)
+            self.domain_mask[var] = key[1]
+            self.letter_masks[var] = [dict(masks) for masks in indexed[key]]
+            self.indexed_words[var] = set(words)
+            self.mrv_changed.add(var)
+        self.lost_support = dict()
+
+    def sync_domains(self, variables=None):
+        """
+        Bring the bitmasks of `variables`, or of every variable if None, up
+        to date with `self.domains`, which callers may have changed directly.
+        Words of the wrong length are removed from those domains first, as
+        the bitmasks of a variable only stand for words of its length.
+
+        This compares each domain with the words it was indexed from, which
+        takes time linear in the size of the domains even when nothing
+        changed.
+        """
+        if variables is None:
+            variables = self.domains
+        stale = []
+        for var in variables:
+            words = self.domains[var]
+            # Every word of the vocabulary of the right length is kept, so
+            # only words outside it need their length checked. That is none
+            # at all for the domains `__init__` builds
+            vocabulary = self.words_by_length.get(var.length, set())
+            if not words <= vocabulary:
+                new_words = words - vocabulary
+                words.difference_update(
+                    [word for word in new_words if len(word) != var.length]
+                )
+                for word in sorted(words - vocabulary):
+                    self.add_word(word)
+            if words != self.indexed_words.get(var):
+                stale.append(var)
+        if stale:
+            self.index_domains(stale)
+
+    def add_word(self, word):
+        """
+        Number a `word` that is not in the crossword's vocabulary, so that
+        it can be indexed like the others.
+        """
+        same_length = self.words_of_length.setdefault(len(word), [])
+        self.word_id[word] = len(same_length)
+        self.word_bit[word] = 1 << len(same_length)
+        same_length.append(word)
+        self.words_by_length.setdefault(len(word), set()).add(word)
+        self.codes_of_length.pop(len(word), None)
+
+    def words_mask(self, words):
+        """
+        Return the bitmask of a set of `words` of one length.
+        """
+        mask = 0
+        for word in words:
+            mask |= self.word_bit[word]
+        return mask
+
+    def letter_masks_of(self, length, words):
+        """
+        Return, for each position k of words of `length`, a dict mapping
+        each letter to the bitmask of the `words` with that letter at k.
+        """
+        if not words:
+            return [dict() for _ in range(length)]
+        codes = self.word_codes(length)
+        member = np.zeros(len(codes), dtype=bool)
+        member[[self.word_id[word] for word in words]] = True
+        letter_masks = []
+        for k in range(length):
+            column = codes[:, k]
+            letter_masks.append({
+                chr(code): bits_of(member & (column == code))
+                for code in np.unique(column[member])
+            })
+        return letter_masks
+
+    def word_codes(self, length):
+        """
+        Return the table of letters of the words of `length`, whose entry
+        [id, k] is the code point of the k-th letter of the word with that
+        id, building it the first time it is needed.
+        """
+        if length not in self.codes_of_length:
+            words = self.words_of_length[length]
+            # Decode all the words in one go
+            text = np.frombuffer("".join(words).encode("utf-32-le"), np.uint32)
+            self.codes_of_length[length] = text.reshape(len(words), length)
+        return self.codes_of_length[length]
+
+    def remove_words(self, var, words):
+        """
+        Remove `words` from the domain of `var`, keeping the bitmasks up to
+        date and recording in `self.lost_support` any position of `var` that
+        no longer has a word with a letter one of `words` had there.
+        """
+        if not words:
+            return
+        self.domains[var].difference_update(words)
+        self.indexed_words[var].difference_update(words)
+        self.mrv_changed.add(var)
+        # Clear all of the words' bits at once, visiting each letter they
+        # have at a position once rather than once per word
+        keep = ~self.words_mask(words)
+        changed = []
+        if self.searching:
+            self.removed.append((var, words, self.domain_mask[var], changed))
+        self.domain_mask[var] &= keep
+        for k, letter_masks in enumerate(self.letter_masks[var]):
+            for letter in {word[k] for word in words}:
+                changed.append((k, letter, letter_masks[letter]))
+                mask = letter_masks[letter] & keep
+                if mask:
+                    letter_masks[letter] = mask
+                else:
+                    del letter_masks[letter]
+                    self.lost_support.setdefault(var, set()).add(k)
+
+    def add_conflicts(self, var, culprits):
+        """
+        Record that the assigned variables in `culprits` led to words being
+        removed from the domain of `var`.
+        """
+        conflicts = self.conflicts[var]
+        if not culprits <= conflicts:
+            self.conflict_log.append((var, conflicts))
+            self.conflicts[var] = conflicts | culprits
+
+    def checkpoint(self):
+        """
+        Return a mark for `restore` to undo every change made after it.
+        """
+        return len(self.removed), len(self.conflict_log)
+
+    def restore(self, mark):
+        """
+        Put back every word removed by `remove_words`, and every conflict
+        recorded by `add_conflicts`, since `checkpoint` returned `mark`.
+        """
+        removed, logged = mark
+        while len(self.conflict_log) > logged:
+            var, conflicts = self.conflict_log.pop()
+            self.conflicts[var] = conflicts
+        # Batches are undone latest first, so putting back the masks each
+        # one saved returns them to how they were before it
+        while len(self.removed) > removed:
+            var, words, domain_mask, changed = self.removed.pop()
+            self.mrv_changed.add(var)
+            self.domains[var].update(words)
+            self.indexed_words[var].update(words)
+            self.domain_mask[var] = domain_mask
+            letter_masks = self.letter_masks[var]
+            for k, letter, mask in changed:
+                letter_masks[k][letter] = mask
+        self.lost_support = dict()
+
+    def push_mrv(self, var):
+        """
+        Push an entry for `var` with its current domain size onto
+        `self.mrv_heap`.
+        """
+        heapq.heappush(self.mrv_heap, (
+            len(self.domains[var]), -self.degree[var], self.var_id[var], var
+        ))
 
-    def revise(self, x, y):
+    def revise(self, x, y, overlap=None):
         """
         Make variable `x` arc consistent with variable `y`.
         To do so, remove values from `self.domains[x]` for which there is no
         possible corresponding value for `y` in `self.domains[y]`.
+        `overlap` may give the (i, j) overlap of `x` and `y` if the caller
+        already has it.
 
         Return True if a revision was made to the domain of `x`; return
         False if no revision was made.
+
+        The bitmasks of `x` and `y` are synced first, in case a caller
+        changed their domains, which takes time linear in the size of both;
+        `ac3` syncs once and the search not at all, calling `prune` instead.
         """
-        revised = False
-        for x_word in self.domains[x].copy():
-            hasCorresponding = False
-            for y_word in self.domains[y]:
-                # Check if x and y overlap
-                overlap = self.crossword.overlaps[x, y]
-                if overlap is None:
-                    continue
-                i, j = overlap
-                # Check if the character at the overlap match
-                if x_word[i] == y_word[j]:
-                    hasCorresponding = True
-                    break
-            if not hasCorresponding:
-                self.domains[x].remove(x_word)
-                revised = True
-        return revised
+        # Check if x and y overlap
+        if overlap is None:
+            overlap = self.overlap_of[x].get(y)
+            if overlap is None:
+                return False
+        i, j = overlap
+        self.sync_domains((x, y))
+        return self.prune(x, y, i, j)
+
+    def prune(self, x, y, i, j):
+        """
+        Revise `x` against `y`, which overlap at (i, j), as `revise` does,
+        with the bitmasks of both already up to date.
+        """
+        # An x_word has a corresponding y_word if some word in the domain
+        # of y has the same character at the overlap. Comparing the letters
+        # both domains have there settles most arcs without visiting any word
+        letters = self.letter_masks[y][j]
+        unsupported = {
+            letter for letter in self.letter_masks[x][i] if letter not in letters
+        }
+        if not unsupported:
+            return False
+        self.remove_words(x, [w for w in self.domains[x] if w[i] in unsupported])
+        # Whatever narrowed the domain of y is to blame for this as well
+        self.add_conflicts(x, self.conflicts[y])
+        return True
 
     def ac3(self, arcs=None):
         """
@@ -142,22 +455,48 @@ class CrosswordCreator():
         Return True if arc consistency is enforced and no domains are empty;
         return False if one or more domains end up empty.
         """
+        # Queue each arc along with its overlap, looked up once here, and
+        # leave out pairs that do not overlap since revising them is a no-op
         if arcs is None:
-            arcs = []
-            for x in self.domains:
-                for y in self.domains:
-                    if x != y and self.crossword.overlaps[x, y] is not None:
-                        arcs.append((x, y))
-        while arcs:
-            (x, y) = arcs.pop()  # Get an arc (x, y) from the list for processing
-            if self.revise(x, y):  # If a revision was made
+            arcs = [
+                (x, y, i, j)
+                for x in self.overlap_of
+                for y, (i, j) in self.overlap_of[x].items()
+            ]
+        else:
+            arcs = [
+                (x, y) + self.overlap_of[x][y]
+                for x, y in arcs if y in self.overlap_of[x]
+            ]
+        self.sync_domains()
+        return self.propagate(arcs)
+
+    def propagate(self, arcs):
+        """
+        Make the (x, y, i, j) `arcs` arc consistent as `ac3` does, with the
+        bitmasks of every domain already up to date.
+        """
+        # FIFO queue of arcs, plus the same arcs as a set so an arc
+        # already waiting to be processed is not queued twice
+        queue = deque(arcs)
+        queued = set(queue)
+        while queue:
+            arc = queue.popleft()  # Get an arc (x, y) from the queue for processing
+            queued.discard(arc)
+            x, y, i, j = arc
+            if self.prune(x, y, i, j):  # If a revision was made
                 if not self.domains[x]:  # If domain is empty
+                    self.wiped_out = x
                     return False
-                for z in self.domains:
-                    if z != x and z != y and self.crossword.overlaps[x, z] is not None:
-                        arcs.append(
-                            (z, x)
-                        )  # Add (z, x) to the list of arcs to be processed
+                # Only arcs into an overlap of x that lost a letter can change
+                lost = self.lost_support.pop(x, set())
+                for z, (k, m) in self.overlap_of[x].items():
+                    if z == y or k not in lost:
+                        continue
+                    arc = (z, x, m, k)
+                    if arc not in queued:
+                        queue.append(arc)  # Add (z, x) to the arcs to be processed
+                        queued.add(arc)
         return True
 
     def assignment_complete(self, assignment):
@@ -206,6 +545,34 @@ class CrosswordCreator():
 
         return True
 
+    def assignment_values(self, assignment):
+        """
+        Return the list of words in `assignment`, indexed by variable id,
+        with None for each unassigned variable.
+        """
+        values = [None] * len(self.variables)
+        for var, word in assignment.items():
+            values[self.var_id[var]] = word
+        return values
+
+    def consistent_value(self, var, value, values, used_words):
+        """
+        Return True if adding `var` = `value` to the already consistent
+        assignment `values`, as given by `assignment_values`, keeps it
+        consistent; return False otherwise.
+        `used_words` must be the set of words in `values`.
+
+        Only the constraints involving `var` can be broken, so this checks
+        just those rather than the whole assignment.
+        """
+        if value in used_words or len(value) != var.length:
+            return False
+        for _, k, i, j in self.overlap_ids[var]:
+            word = values[k]
+            if word is not None and value[i] != word[j]:
+                return False
+        return True
+
     def order_domain_values(self, var, assignment):
         """
         Return a list of values in the domain of `var`, in order by
@@ -213,21 +580,62 @@ class CrosswordCreator():
         The first value in the list, for example, should be the one
         that rules out the fewest values among the neighbors of `var`.
         """
-        def count_rule_outs(value):
-            count = 0
-            for neighbor in self.crossword.neighbors(var):
-                if neighbor in assignment:
-                    continue  # Skip assigned neighbors
-                i, j = self.crossword.overlaps[var, neighbor]
-
-                # For each word in the neighbor's domain, check if it conflicts with this value
-                for word in self.domains[neighbor]:
-                    if value[i] != word[j]:
-                        count += 1  # If the overlap characters don't match, then this value is ruled out for the neighbor
+        neighbors = [
+            neighbor for neighbor in self.neighbors[var] if neighbor not in assignment
+        ]
+        self.sync_domains([var] + neighbors)
+        # Copy the list, which may be the one kept in `self.order_cache`
+        return list(self.ordered_values(var, self.assignment_values(assignment)))
 
-            return count
+    def ordered_values(self, var, values):
+        """
+        Return the values in the domain of `var` as `order_domain_values`
+        does, given the assignment as a list from `assignment_values`.
+        The list returned may be shared with later calls, so must not be
+        changed.
+        """
+        neighbors = [
+            (neighbor, k, i, j)
+            for neighbor, k, i, j in self.overlap_ids[var]
+            if values[k] is None  # Skip assigned neighbors
+        ]
+        if not neighbors:
+            return list(self.domains[var])
+
+        # The ordering depends only on the domains involved, and the same
+        # domains come up again as backtracking undoes and redoes pruning.
+        # Each neighbor's id goes in the key along with its domain, since
+        # which neighbors are unassigned decides the overlaps that count
+        key = (var, self.domain_mask[var]) + tuple(
+            (k, self.domain_mask[neighbor]) for neighbor, k, _, _ in neighbors
+        )
+        if key in self.order_cache:
+            return self.order_cache[key]
+
+        words = list(self.domains[var])
+        if not words:
+            return words
+        codes = self.word_codes(var.length)[
+            np.fromiter((self.word_id[word] for word in words), np.intp, len(words))
+        ]
 
-        return sorted(self.domains[var], key=count_rule_outs)
+        # For each neighbor, count the words in its domain with each letter
+        # at the overlap: a value rules out all of the neighbor's other words
+        rule_outs = np.zeros(len(words), dtype=np.int64)
+        for neighbor, _, i, j in neighbors:
+            column = codes[:, i]
+            fit = np.zeros(int(column.max()) + 1, dtype=np.int64)
+            for letter, mask in self.letter_masks[neighbor][j].items():
+                if ord(letter) < len(fit):
+                    fit[ord(letter)] = mask.bit_count()
+            rule_outs += len(self.domains[neighbor]) - fit[column]
+
+        # A stable sort keeps ties in domain order, as sorted() would
+        ordered = [words[k] for k in np.argsort(rule_outs, kind="stable")]
+        if len(self.order_cache) >= ORDER_CACHE_SIZE:
+            self.order_cache.clear()
+        self.order_cache[key] = ordered
+        return ordered
 
     def select_unassigned_variable(self, assignment):
         """
@@ -237,19 +645,40 @@ class CrosswordCreator():
         degree. If there is a tie, any of the tied variables are acceptable
         return values.
         """
-        # Function to find the number of remaining values in the domain
-        def domain_size(var):
-            return len(self.domains[var])
-
-        # Function to find the degree of the variable
-        def degree(var):
-            return len(self.crossword.neighbors(var))
-
         # Select the unassigned variable with the minimum domain size and then the highest degree
         unassigned = [v for v in self.domains if v not in assignment]
         if not unassigned:
             return None  # Return None if all variables are assigned
-        return min(unassigned, key=lambda v: (domain_size(v), -degree(v)))
+        return min(
+            unassigned, key=lambda v: (len(self.domains[v]), -self.degree[v])
+        )
+
+    def select_variable(self, values):
+        """
+        Return a variable chosen as `select_unassigned_variable` does,
+        given the assignment as a list from `assignment_values`.
+        Only `search` may use this, as the heap it keeps between calls
+        assumes the assignment changes one variable at a time.
+        """
+        heap = self.mrv_heap
+        # Start over from the unassigned variables if entries were lost to
+        # an earlier search or stale ones have piled up
+        if not heap or len(heap) > MRV_HEAP_SIZE:
+            heap.clear()
+            self.mrv_changed.update(self.domains)
+        for var in self.mrv_changed:
+            self.push_mrv(var)
+        self.mrv_changed.clear()
+
+        # The first entry that is up to date and for an unassigned variable
+        # has the minimum domain size and then the highest degree
+        while heap:
+            size, _, k, var = heap[0]
+            if values[k] is not None or size != len(self.domains[var]):
+                heapq.heappop(heap)
+                continue
+            return var
+        return None  # Return None if all variables are assigned
 
     def backtrack(self, assignment):
         """
@@ -264,18 +693,108 @@ class CrosswordCreator():
         if self.assignment_complete(assignment):
             return assignment
 
+        # The search only checks the words it adds against those already
+        # assigned, so those must not conflict to begin with
+        if not self.consistent(assignment):
+            return None
+
+        # The search keeps the bitmasks up to date itself, so they only need
+        # syncing once here
+        self.sync_domains()
+        # Entries left on the MRV heap by an earlier search may be missing
+        # for variables unassigned in this one, so start it afresh
+        self.mrv_heap.clear()
+
+        # Search with the assignment as a list, which is cheaper to copy
+        # and to look variables up in than a dict keyed by Variable. The
+        # pruning it does is undone afterwards, even when it succeeds, so
+        # that the domains are left as they were for the next call
+        mark = self.checkpoint()
+        self.searching = True
+        try:
+            values, _ = self.search(
+                self.assignment_values(assignment),
+                len(assignment),
+                set(assignment.values()),
+            )
+        finally:
+            self.searching = False
+            self.restore(mark)
+        if values is None:
+            return None
+        return dict(zip(self.variables, values))
+
+    def search(self, values, count, used_words):
+        """
+        Extend the assignment `values`, as given by `assignment_values`, of
+        `count` variables to a complete one as `backtrack` does.
+        `used_words` must be the set of words in `values`, and is updated in
+        place as words are tried.
+
+        Return the complete assignment as a list and None, or None and the
+        set of assigned variables to blame if no complete assignment is
+        possible. Search can only succeed again after one of those
+        variables is given another value.
+        """
+        # If assignment is complete, return it
+        if count == len(values):
+            return values, None
+
         # Select an unassigned variable
-        var = self.select_unassigned_variable(assignment)
-
-        for value in self.order_domain_values(var, assignment):
-            new_assignment = assignment.copy()
-            new_assignment[var] = value
-            # If the assignment is consistent, call backtrack
-            if self.consistent(new_assignment):
-                result = self.backtrack(new_assignment)
+        var = self.select_variable(values)
+
+        # Assigned variables to blame for the values of var that failed
+        culprits = set()
+        for value in self.ordered_values(var, values):
+            # If the assignment is consistent, call search
+            if not self.consistent_value(var, value, values, used_words):
+                # The value clashes with an assigned neighbor or repeats
+                # the word of some other variable
+                culprits.update(
+                    neighbor for neighbor, k, _, _ in self.overlap_ids[var]
+                    if values[k] is not None
+                )
+                if value in used_words:
+                    culprits.add(self.variables[values.index(value)])
+                continue
+            new_values = values.copy()
+            new_values[self.var_id[var]] = value
+            # Maintain arc consistency: narrow the domain of var to value
+            # and prune the unassigned neighbors to match, undoing it all
+            # if that leads nowhere
+            mark = self.checkpoint()
+            self.remove_words(var, self.domains[var] - {value})
+            self.add_conflicts(var, {var})
+            arcs = [
+                (neighbor, var, j, i)
+                for neighbor, k, i, j in self.overlap_ids[var]
+                if new_values[k] is None
+            ]
+            if self.propagate(arcs):
+                used_words.add(value)
+                result, blamed = self.search(new_values, count + 1, used_words)
                 if result is not None:
-                    return result
-        return None  # If no solution, return None
+                    return result, None
+                used_words.remove(value)
+                if var not in blamed:
+                    # The failure does not depend on the value of var, so
+                    # jump straight back to the latest variable it does
+                    # depend on
+                    self.restore(mark)
+                    self.mrv_changed.add(var)
+                    return None, blamed
+                culprits |= blamed
+            else:
+                culprits |= self.conflicts[self.wiped_out]
+            self.restore(mark)
+
+        # var goes back to being unassigned, so it needs a heap entry again
+        self.mrv_changed.add(var)
+        # The values pruned from the domain of var might have worked had the
+        # variables that pruned them been assigned differently
+        culprits |= self.conflicts[var]
+        culprits.discard(var)
+        return None, culprits  # If no solution, return None
 
 
 def main():
@@ -1,4 +1,6 @@
 import nltk
+import re
+import string
 import sys
 
 TERMINALS = """
@@ -21,7 +23,14 @@ VP -> V | V NP | VP NP | VP Adv | VP P NP | VP Conj VP
 """
 
 grammar = nltk.CFG.fromstring(NONTERMINALS + TERMINALS)
-parser = nltk.ChartParser(grammar)
+parser = nltk.LeftCornerChartParser(grammar)
+
+# The word tokenizer is used directly, without Punkt sentence splitting.
+# It only splits the period off the end of the whole input, so any left on
+# a word by an earlier sentence is stripped in `preprocess`
+tokenizer = nltk.tokenize.TreebankWordTokenizer()
+# Matches any alphabetic character, as str.isalpha() does
+ALPHA_RE = re.compile(r"[^\W\d_]")
 
 
 def main():
@@ -67,9 +76,12 @@ def preprocess(sentence):
     # Convert sentence to lowercase
     lowercase_sentence = sentence.lower()
     # Tokenize the sentence into words
-    tokens = nltk.word_tokenize(lowercase_sentence)
+    tokens = [
+        token.rstrip(string.punctuation)
+        for token in tokenizer.tokenize(lowercase_sentence)
+    ]
     # Filter out words that do not contain at least one alphabetic character
-    words = [word for word in tokens if any(char.isalpha() for char in word)]
+    words = [word for word in tokens if ALPHA_RE.search(word)]
     return words
 
 
@@ -80,22 +92,31 @@ def np_chunk(tree):
     whose label is "NP" that does not itself contain any other
     noun phrases as subtrees.
     """
-    noun_phrases = []
-
-    # Iterate through all subtrees of the given tree
-    for subtree in tree.subtrees():
-        # Check if the subtree label is "NP"
-        if subtree.label() == "NP":
-            # Check if the subtree does not itself contain any other "NP" as subtrees
-            if not any(
-                child.label() == "NP"
-                for child in subtree.subtrees(
-                    lambda t: t != subtree
-                )  # `subtree.subtrees()` returns all subtrees, including the `subtree` itself. Here, exclude the subtree itself.
-            ):
-                noun_phrases.append(subtree)
-
-    return noun_phrases
+
+    def walk(node):
+        """
+        Return whether `node` is or contains an NP, along with the
+        NP chunks found beneath it, in a single post-order pass.
+        """
+        # Leaves are plain strings and hold no noun phrases
+        if not isinstance(node, nltk.Tree):
+            return False, []
+
+        contains_np = False
+        chunks = []
+        for child in node:
+            child_contains_np, child_chunks = walk(child)
+            contains_np = contains_np or child_contains_np
+            chunks.extend(child_chunks)
+
+        # An NP is a chunk only if none of its descendants is an NP
+        if node.label() == "NP":
+            if not contains_np:
+                chunks.append(node)
+            return True, chunks
+        return contains_np, chunks
+
+    return walk(tree)[1]
 
 
 if __name__ == "__main__":